@@ -1,7 +1,14 @@
+import threading
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 from gutenberg_pipeline.config import Config
 
-engine = create_engine(Config.DB_URI, echo=Config.ECHO_SQL)
+# values_plus_batch is specific to psycopg2; switch to executemany_mode="values" with psycopg 3.
+engine = create_engine(Config.DB_URI, echo=Config.ECHO_SQL,
+                       executemany_mode="values_plus_batch", insertmanyvalues_page_size=1000,
+                       pool_size=10, max_overflow=20, pool_pre_ping=True, query_cache_size=1200)
 Session = scoped_session(sessionmaker(bind=engine))
 Base = declarative_base()
+# Serializes committing writes within the process, reads are left concurrent.
+write_lock = threading.RLock()
@@ -1,12 +1,15 @@
+import asyncio
 import logging
-import re
+import string
 from typing import Optional
 
-from aiohttp import ClientSession, ClientError, http_exceptions
+from aiohttp import ClientSession, ClientError, ClientTimeout, TCPConnector, http_exceptions
 from asyncio import Semaphore
 
 logger = logging.getLogger("__name__")
 
+_ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
 async def parse_book(semaphore: Semaphore, http_session: ClientSession, metadata: dict)\
         -> Optional[str]:
     """
@@ -23,8 +26,11 @@ async def parse_book(semaphore: Semaphore, http_session: ClientSession, metadata
             async with http_session.get(metadata["book_link"]) as response:
                 try:
                     response.raise_for_status()
-                    text = await response.text()
-                    return extract_book_content(metadata.get("title"), text)
+                    body = bytearray()
+                    async for chunk in response.content.iter_chunked(65536):
+                        body.extend(chunk)
+                    return extract_book_content_from_bytes(metadata.get("title"), body,
+                                                           response.charset or "utf-8")
                 except (ClientError, http_exceptions.HttpProcessingError) as e:
                     logger.error(f"Failed to fetch book {metadata['book_link']} content: {response.status} {e.message}")
                     return None
@@ -32,6 +38,34 @@ async def parse_book(semaphore: Semaphore, http_session: ClientSession, metadata
         logger.error(f"Error fetching book content: {e}")
         return None
 
+def create_http_session(concurrency: int = 64) -> ClientSession:
+    """
+    Create an HTTP session whose connections can be reused across many book downloads.
+    :param concurrency: Maximum number of simultaneous connections to a single host.
+    :return: Client session, to be used as an async context manager.
+    """
+    # Capping connections per host keeps the mirror from throttling a burst of new connections.
+    connector = TCPConnector(limit=concurrency * 2, limit_per_host=concurrency, ttl_dns_cache=300,
+                             keepalive_timeout=75, enable_cleanup_closed=True)
+    return ClientSession(connector=connector, timeout=ClientTimeout(total=60, connect=10))
+
+async def fetch_all(metadata_list: list[dict], concurrency: int = 64,
+                    http_session: Optional[ClientSession] = None) -> list[Optional[str]]:
+    """
+    Download the content of many books concurrently over a single connection pool.
+    :param metadata_list: Metadata dictionaries of the books to download.
+    :param concurrency: Maximum number of simultaneous downloads.
+    :param http_session: Session to reuse, a new one is created for this call when omitted.
+    :return: Book contents in the order of metadata_list, None for failed downloads.
+    """
+    semaphore = Semaphore(concurrency)
+    if http_session is None:
+        async with create_http_session(concurrency) as http_session:
+            return await fetch_all(metadata_list, concurrency, http_session)
+
+    return await asyncio.gather(*[parse_book(semaphore, http_session, metadata)
+                                  for metadata in metadata_list])
+
 def extract_book_content(title: str, text: str) -> str:
     """
     Retrieve only book content
@@ -39,13 +73,63 @@ def extract_book_content(title: str, text: str) -> str:
     :param text:
     :return:
     """
-    start_pattern = r"\*{3} start of the project GUTENBERG EBOOK "+title+r" \*{3}"
-    end_pattern = r"\*{3} end of the project GUTENBERG EBOOK " + title + r" \*{3}"
-    pattern = start_pattern+r"(.+)"+end_pattern
-    match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-    if match:
-        content = match.group(1).strip()
+    start_marker = f"*** START OF THE PROJECT GUTENBERG EBOOK {title.upper()} ***"
+    end_marker = f"*** END OF THE PROJECT GUTENBERG EBOOK {title.upper()} ***"
+    upper_text = text.upper()
+    if len(upper_text) != len(text):
+        # Some characters expand when upper-cased, keep offsets aligned with the original text.
+        upper_text = text.translate(_ASCII_UPPER)
+
+    start = upper_text.find(start_marker)
+    if start != -1:
+        start += len(start_marker)
+        end = upper_text.find(end_marker, start)
+        if end != -1:
+            content = text[start:end].strip()
+            if content:
+                return content
+
+    return text
+
+def _content_between_markers(haystack: bytes, body: bytes, title: bytes, encoding: str) -> Optional[str]:
+    """
+    Decode the part of body between the start and end markers of title, as located in haystack.
+    """
+    start_marker = b"*** START OF THE PROJECT GUTENBERG EBOOK " + title + b" ***"
+    end_marker = b"*** END OF THE PROJECT GUTENBERG EBOOK " + title + b" ***"
+    start = haystack.find(start_marker)
+    if start == -1:
+        return None
+    start += len(start_marker)
+    end = haystack.find(end_marker, start)
+    if end == -1:
+        return None
+    # Decoding from a view does not copy the content out of the body first.
+    with memoryview(body) as view:
+        return str(view[start:end], encoding, errors="replace").strip() or None
+
+def extract_book_content_from_bytes(title: Optional[str], body: bytes, encoding: str = "utf-8") -> str:
+    """
+    Retrieve only book content from a raw response body.
+    The markers are first located on the bytes, so only the content between them gets decoded.
+    When they are not found there, the decoded text is searched instead.
+    :param title: Book title as written in the Gutenberg markers.
+    :param body: Raw book text.
+    :param encoding: Encoding of the body.
+    :return: Decoded book content, or the whole text when the markers are not found.
+    """
+    title = title or ""
+    # bytes.upper() only maps ASCII letters: the title and the body are upper-cased with the same
+    # rule, so non-ASCII letters have to match as written and offsets stay aligned with the body.
+    ascii_upper_title = title.encode(encoding, errors="replace").upper()
+    # Markers are usually written in upper case already, which needs no upper-cased copy of the body.
+    for upper_title in dict.fromkeys((title.upper().encode(encoding, errors="replace"), ascii_upper_title)):
+        content = _content_between_markers(body, body, upper_title, encoding)
         if content:
             return content
 
-    return text
\ No newline at end of file
+    content = _content_between_markers(body.upper(), body, ascii_upper_title, encoding)
+    if content:
+        return content
+
+    return extract_book_content(title, body.decode(encoding, errors="replace"))
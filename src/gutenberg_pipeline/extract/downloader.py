@@ -1,8 +1,11 @@
+import json
 import logging
 import os
+import queue
 import tarfile
-import time
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
@@ -12,12 +15,14 @@ from urllib3 import Retry
 
 logger = logging.getLogger(__name__)
 
-def download_rdf_file(url: str, filename: Path) -> None:
-    """
-    Download a file from a URL with support for resuming downloads.
-    """
-    total_size = int(requests.head(url).headers.get("Content-Length", 0))
+DOWNLOAD_SLICES = 8
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+# Bytes downloaded by a slice between two saves of the .progress file.
+PROGRESS_SAVE_INTERVAL = 8 << 20
+EXTRACT_WORKERS = 8
 
+
+def _create_session() -> requests.Session:
     session = requests.Session()
     retry_strategy = Retry(
         total=5,
@@ -26,30 +31,169 @@ def download_rdf_file(url: str, filename: Path) -> None:
         allowed_methods=["GET"],
         raise_on_status=False,
     )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=DOWNLOAD_SLICES)
     session.mount("https://", adapter)
-    logger.info(f"Starting download: {filename}")
-    while True:
-        try:
-            downloaded_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+    session.mount("http://", adapter)
+    return session
 
-            if downloaded_size >= total_size:
-                logger.info(f"Download complete: {filename}")
-                break
 
-            headers = {"Range": f"bytes={downloaded_size}-"}
+def _load_progress(progress_file: Path, slices: list[tuple[int, int]]) -> list[int]:
+    """
+    Return the number of bytes already downloaded for each slice.
+    """
+    try:
+        with open(progress_file) as f:
+            progress = json.load(f)
+        if len(progress) == len(slices):
+            return progress
+    except (OSError, ValueError):
+        pass
+    return [0] * len(slices)
+
+
+def _save_progress(progress_file: Path, progress: list[int], lock: threading.Lock) -> None:
+    with lock:
+        tmp_file = progress_file.with_name(progress_file.name + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp_file, progress_file)
+
+
+def _download_slice(session: requests.Session, url: str, fd: int, index: int, start: int, end: int,
+                    progress: list[int], progress_file: Path, lock: threading.Lock, pbar: tqdm,
+                    stop: threading.Event) -> None:
+    """
+    Download the byte range [start, end] of a file, retrying and resuming from the last written byte.
+    Progress is saved every PROGRESS_SAVE_INTERVAL bytes, so a killed download resumes close to where
+    it stopped. The slice returns early once stop is set.
+    """
+    while start + progress[index] <= end and not stop.is_set():
+        offset = start + progress[index]
+        saved = offset
+        try:
+            headers = {"Range": f"bytes={offset}-{end}"}
             with session.get(url, headers=headers, stream=True, timeout=(10, 60)) as r:
                 r.raise_for_status()
-                mode = 'ab' if downloaded_size else 'wb'
-                with open(filename, mode) as f:
-                    with tqdm(total=total_size, initial=downloaded_size, unit='B', unit_scale=True, desc=url) as pbar:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                            pbar.update(len(chunk))
+                # Bytes of the body that come before the slice.
+                skip = 0
+                if r.status_code != 206:
+                    # The server ignored the range, the body starts at the beginning of the file.
+                    pbar.update(-progress[index])
+                    progress[index] = 0
+                    offset = skip = start
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if skip:
+                        chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                    # Never write past the slice, it belongs to another one.
+                    chunk = chunk[:end + 1 - offset]
+                    if chunk:
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+                        progress[index] = offset - start
+                        pbar.update(len(chunk))
+                        if offset - saved >= PROGRESS_SAVE_INTERVAL:
+                            _save_progress(progress_file, progress, lock)
+                            saved = offset
+                    if offset > end or stop.is_set():
+                        break
 
         except requests.exceptions.RequestException as e:
-            logger.warning(f"Request error: {e}. Retrying in 5 seconds...")
-            time.sleep(5)
+            logger.warning(f"Request error on slice {index}: {e}. Retrying in 5 seconds...")
+            stop.wait(5)
+        finally:
+            _save_progress(progress_file, progress, lock)
+
+
+def download_rdf_file(url: str, filename: Path) -> None:
+    """
+    Download a file from a URL over several concurrent range requests.
+    Data is written to a .part file next to the target and the bytes done per slice are
+    kept in a .progress file, so an interrupted download resumes where it stopped.
+    """
+    session = _create_session()
+    head = session.head(url, allow_redirects=True)
+    head.raise_for_status()
+    total_size = int(head.headers.get("Content-Length", 0))
+    if total_size <= 0:
+        # Without a size the slices cannot be computed, and an empty file would pass for a complete one.
+        raise ValueError(f"Cannot download {url}: the server did not report its size.")
+    slice_count = DOWNLOAD_SLICES if head.headers.get("Accept-Ranges") == "bytes" else 1
+    slices = [(i * total_size // slice_count, (i + 1) * total_size // slice_count - 1)
+              for i in range(slice_count)]
+
+    part_file = filename.with_name(filename.name + ".part")
+    progress_file = filename.with_name(filename.name + ".progress")
+    progress = _load_progress(progress_file, slices) if part_file.exists() else [0] * slice_count
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    logger.info(f"Starting download: {filename}")
+    fd = os.open(part_file, os.O_RDWR | os.O_CREAT)
+    try:
+        os.ftruncate(fd, total_size)
+        with tqdm(total=total_size, initial=sum(progress), unit='B', unit_scale=True, desc=url) as pbar:
+            with ThreadPoolExecutor(max_workers=slice_count) as executor:
+                futures = [executor.submit(_download_slice, session, url, fd, index, start, end,
+                                           progress, progress_file, lock, pbar, stop)
+                           for index, (start, end) in enumerate(slices)]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # Also on Ctrl+C: stop the other slices instead of waiting for them to finish.
+                    stop.set()
+                    raise
+    finally:
+        os.close(fd)
+
+    os.replace(part_file, filename)
+    progress_file.unlink(missing_ok=True)
+    logger.info(f"Download complete: {filename}")
+
+
+def _write_extracted_files(files: queue.Queue) -> None:
+    """
+    Write (path, data) items from the queue until None is received.
+    The queue is always drained, the first write error is raised at the end.
+    """
+    error = None
+    while (item := files.get()) is not None:
+        if error is not None:
+            continue
+        path, data = item
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            error = e
+    if error is not None:
+        raise error
+
+
+def _extract_tar_stream(tar_ref: tarfile.TarFile, extract_to: Path) -> None:
+    """
+    Extract the regular files of a streamed tar, writing them from a pool of threads.
+    The archive is read sequentially in the calling thread, file system calls run in the workers.
+    """
+    root = os.path.realpath(extract_to)
+    files = queue.Queue(maxsize=EXTRACT_WORKERS * 64)
+    with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+        writers = [executor.submit(_write_extracted_files, files) for _ in range(EXTRACT_WORKERS)]
+        try:
+            for member in tar_ref:
+                if not member.isfile():
+                    continue
+                path = os.path.realpath(os.path.join(root, member.name))
+                if os.path.commonpath([root, path]) != root:
+                    logger.warning(f"Skipping file outside of the extraction folder: {member.name}")
+                    continue
+                files.put((path, tar_ref.extractfile(member).read()))
+        finally:
+            for _ in writers:
+                files.put(None)
+        for writer in writers:
+            writer.result()
 
 
 def extract_tar_zip_file(zip_file: Path, directory_name: str) -> None:
@@ -61,16 +205,13 @@ def extract_tar_zip_file(zip_file: Path, directory_name: str) -> None:
     """
     extract_to = zip_file.parent/directory_name
     with zipfile.ZipFile(zip_file, "r") as zip_ref:
-        zip_ref.extractall(extract_to)
-
-    for file in os.listdir(extract_to):
-        if file.endswith('.tar'):
-            tar_path = os.path.join(extract_to, file)
+        for info in zip_ref.infolist():
+            if info.filename.endswith('.tar'):
+                # Stream the inner tar sequentially instead of writing it to disk first.
+                with zip_ref.open(info) as raw, tarfile.open(fileobj=raw, mode='r|') as tar_ref:
+                    _extract_tar_stream(tar_ref, extract_to)
 
-            with tarfile.open(tar_path, 'r') as tar_ref:
-                tar_ref.extractall(extract_to)
-
-            logger.info(f"Extracted: {tar_path}")
-            break
-    else:
-        logger.info("No .tar file found inside the .zip")
+                logger.info(f"Extracted: {info.filename}")
+                break
+        else:
+            logger.info("No .tar file found inside the .zip")
@@ -1,7 +1,9 @@
 import logging
+import threading
 from pathlib import Path
-import xml.etree.ElementTree as ElementTree
-from typing import Optional
+from typing import Iterator, Optional
+
+from lxml import etree
 
 NAMESPACES = {
     'pg': 'http://www.gutenberg.org/2009/pgterms/',
@@ -10,109 +12,152 @@ NAMESPACES = {
     'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
 }
 
-logger = logging.getLogger(__name__)
-
-def parse_xml_file(file_path: Path) -> Optional[ElementTree.ElementTree]:
-    """
-    Parse an XML file and return the ElementTree object.
-    :param file_path: Path to the XML file.
-    :return: ElementTree object.
-    """
-    try:
-        tree = ElementTree.parse(file_path)
-        return tree
-    except ElementTree.ParseError as e:
-        logger.error(f"Error parsing XML file {file_path}: {e}")
-        return None
-
-def extract_metadata(xml_tree: ElementTree.ElementTree) -> dict:
-    """
-    Extract metadata from the XML tree.
-    :param xml_tree:
-    :return:
-    """
-    root = xml_tree.getroot()
-
-    def extract_id(text: str) -> Optional[str]:
-        try:
-            return text.split("/")[-1] if text else None
-        except ValueError:
-            logger.error("Error extracting ID: {e}")
-            return None
+_RDF = NAMESPACES['rdf']
+_RDF_ABOUT = f"{{{_RDF}}}about"
+
+_EBOOK = etree.QName(NAMESPACES['pg'], 'ebook').text
+_CREATOR = etree.QName(NAMESPACES['dc'], 'creator').text
+_FILE = etree.QName(NAMESPACES['pg'], 'file').text
+_BOOKSHELF = etree.QName(NAMESPACES['pg'], 'bookshelf').text
+_LANGUAGE = etree.QName(NAMESPACES['dc'], 'language').text
+_AGENT = etree.QName(NAMESPACES['pg'], 'agent').text
+
+# Elements whose own text is the metadata value, mapped to their metadata key.
+_TEXT_FIELDS = {
+    etree.QName(NAMESPACES['dc'], 'title').text: "title",
+    etree.QName(NAMESPACES['dc'], 'issued').text: "release_date",
+    etree.QName(NAMESPACES['pg'], 'marc520').text: "summary",
+}
 
-    def get_text(tag: str) -> Optional[str]:
-        el = root.find(tag, NAMESPACES)
-        return el.text if el is not None else None
+_TAGS = (_EBOOK, _CREATOR, _FILE, _BOOKSHELF, _LANGUAGE, *_TEXT_FIELDS)
+
+# Lookups inside the streamed elements, compiled once and reused for every RDF file.
+_XP_NAME = etree.XPath('.//pg:name/text()', namespaces=NAMESPACES, smart_strings=False)
+_XP_BIRTH = etree.XPath('.//pg:birthdate/text()', namespaces=NAMESPACES, smart_strings=False)
+_XP_DEATH = etree.XPath('.//pg:deathdate/text()', namespaces=NAMESPACES, smart_strings=False)
+# Link of a pg:file element, only when its format is plain text.
+_XP_PLAIN_TEXT_LINK = etree.XPath(
+    "self::pg:file[starts-with(.//dc:format/rdf:Description/rdf:value, 'text/plain')]/@rdf:about",
+    namespaces=NAMESPACES, smart_strings=False)
+_XP_VALUE = etree.XPath('rdf:Description/rdf:value/text()', namespaces=NAMESPACES, smart_strings=False)
+# Value of a pg:bookshelf element, unless it is a "Browsing: ..." shelf.
+_XP_BOOKSHELF_FILTERED = etree.XPath(
+    "rdf:Description/rdf:value[substring-before(concat(., ':'), ':') != 'Browsing']/text()",
+    namespaces=NAMESPACES, smart_strings=False)
+
+# One pull parser per thread, reused from one RDF file to the next instead of set up for each file.
+_PARSER = threading.local()
+_READ_SIZE = 1 << 16
 
-    def get_text_list(tag: str) -> Optional[list[str]]:
-        el = root.findall(tag, NAMESPACES)
-        return [e.text for e in el] if el else None
+logger = logging.getLogger(__name__)
 
-    def get_book_link() -> Optional[str]:
-        for file_elem in root.findall(".//pg:file", NAMESPACES):
-            format_value = file_elem.find(".//dc:format/rdf:Description/rdf:value", NAMESPACES)
-            if format_value is not None and format_value.text.startswith("text/plain"):
-                return file_elem.attrib.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about")
+def _extract_id(text: Optional[str]) -> Optional[str]:
+    return text.split("/")[-1] if text else None
 
+def _parse_int(text: Optional[str]) -> Optional[int]:
+    try:
+        return int(text) if text else None
+    except (ValueError, TypeError):
         return None
 
-    def get_book_id() -> Optional[int]:
-        el = root.find('.//pg:ebook', NAMESPACES)
-        if el is not None:
-            return parse_int(extract_id(el.attrib.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about")))
+def _first(xpath: etree.XPath, el: etree._Element) -> Optional[str]:
+    res = xpath(el)
+    return res[0] if res else None
 
-        return None
+def _parse_author(creator: etree._Element) -> dict:
+    agent = next(creator.iter(_AGENT), None)
+    return {
+        "id": _extract_id(agent.get(_RDF_ABOUT) if agent is not None else None),
+        "name": _first(_XP_NAME, creator),
+        "birth_year": _parse_int(_first(_XP_BIRTH, creator)),
+        "death_year": _parse_int(_first(_XP_DEATH, creator))
+    }
 
-    def parse_int(text: Optional[str]) -> Optional[int]:
-        try:
-            return int(text) if text else None
-        except (ValueError, TypeError):
-            return None
-
-    def get_nested_text(el: ElementTree.Element, tag: str) -> Optional[str]:
-        child = el.find(tag, NAMESPACES)
-        return child.text if child is not None else None
-
-    def get_authors() -> Optional[list[dict]]:
-        authors = root.findall('.//dc:creator', NAMESPACES)
-        if not authors:
-            return None
-        res = []
-        for author in authors:
-            agent = author.find('.//pg:agent', NAMESPACES)
-            author_id = extract_id(agent.attrib.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about"))
-            author_name = get_nested_text(author, './/pg:name')
-            author_birth_year =  parse_int(get_nested_text(author, './/pg:birthdate'))
-            author_death_year =  parse_int(get_nested_text(author,'.//pg:deathdate'))
-            res.append(
-                {
-                    "id": author_id,
-                    "name": author_name,
-                    "birth_year": author_birth_year,
-                    "death_year": author_death_year
-                }
-            )
-
-        return res if res else None
-
-    def get_bookshelves() -> Optional[list[str]]:
-        bookshelves = get_text_list('.//pg:bookshelf/rdf:Description/rdf:value')
-        if not bookshelves:
-            return None
-        res = []
-        for bookshelf in bookshelves:
-            if bookshelf.split(":")[0] != "Browsing":
-                res.append(bookshelf)
-
-        return res if res else None
+def _free(elem: etree._Element) -> None:
+    """
+    Release an element that has been read, together with its already processed siblings.
+    """
+    elem.clear(keep_tail=True)
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+def _get_parser() -> etree.XMLPullParser:
+    parser = getattr(_PARSER, "parser", None)
+    if parser is None:
+        parser = etree.XMLPullParser(events=("end",), tag=_TAGS, remove_blank_text=True, remove_comments=True,
+                                     collect_ids=False, resolve_entities=False, huge_tree=True)
+        _PARSER.parser = parser
+    return parser
+
+def _iter_elements(parser: etree.XMLPullParser, file_path: Path) -> Iterator[etree._Element]:
+    with open(file_path, "rb") as f:
+        while chunk := f.read(_READ_SIZE):
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                yield elem
+    parser.close()
+    for _, elem in parser.read_events():
+        yield elem
+
+def _reset(parser: etree.XMLPullParser) -> None:
+    """
+    Make the parser ready for the next file, dropping the rest of the current one.
+    """
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        pass
+    for _ in parser.read_events():
+        pass
 
-    return {
-        "gutenberg_id": get_book_id(),
-        "categories": get_bookshelves(),
-        "release_date": get_text('.//dc:issued'),
-        "book_link": get_book_link(),
-        "authors": get_authors(),
-        "title": get_text('.//dc:title'),
-        "summary": get_text('.//pg:marc520'),
-        "language": get_text('.//dc:language/rdf:Description/rdf:value')
+def parse_rdf(file_path: Path) -> Optional[dict]:
+    """
+    Extract book metadata from an RDF file in a single streaming pass.
+    Elements are freed as soon as they have been read, so the full document tree
+    is never held in memory, and parsing stops once the pg:ebook element is closed.
+    :param file_path: Path to the RDF file.
+    :return: Metadata dictionary or None if the file cannot be parsed.
+    """
+    metadata = {
+        "gutenberg_id": None,
+        "categories": None,
+        "release_date": None,
+        "book_link": None,
+        "authors": None,
+        "title": None,
+        "summary": None,
+        "language": None
     }
+    authors = []
+    categories = []
+    parser = _get_parser()
+    try:
+        for elem in _iter_elements(parser, file_path):
+            tag = elem.tag
+            if tag == _CREATOR:
+                authors.append(_parse_author(elem))
+            elif tag == _FILE:
+                # Only the first plain text file is used, the remaining ones are skipped.
+                if metadata["book_link"] is None:
+                    metadata["book_link"] = _first(_XP_PLAIN_TEXT_LINK, elem)
+            elif tag == _BOOKSHELF:
+                categories.extend(_XP_BOOKSHELF_FILTERED(elem))
+            elif tag == _LANGUAGE:
+                if metadata["language"] is None:
+                    metadata["language"] = _first(_XP_VALUE, elem)
+            elif tag == _EBOOK:
+                metadata["gutenberg_id"] = _parse_int(_extract_id(elem.get(_RDF_ABOUT)))
+                # Every targeted element lives inside pg:ebook, the rest of the file is not read.
+                break
+            elif metadata[_TEXT_FIELDS[tag]] is None:
+                metadata[_TEXT_FIELDS[tag]] = elem.text
+            _free(elem)
+    except etree.XMLSyntaxError as e:
+        logger.error(f"Error parsing XML file {file_path}: {e}")
+        return None
+    finally:
+        _reset(parser)
+
+    metadata["authors"] = authors or None
+    metadata["categories"] = categories or None
+    return metadata
@@ -1,15 +1,16 @@
 import asyncio
+import itertools
 import logging
+import os
 import time
-from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
-import aiohttp
 import typer
 
 from gutenberg_pipeline.database import Session
+from gutenberg_pipeline.extract.content_cleaner import create_http_session, fetch_all
 from gutenberg_pipeline.extract.downloader import download_rdf_file, extract_tar_zip_file
-from gutenberg_pipeline.transfer import store_book_to_db
+from gutenberg_pipeline.transfer import extract_all, store_batches_to_db
 from gutenberg_pipeline.config import Config
 
 GUTENBERG_FEEDS_URL = "https://www.gutenberg.org/cache/epub/feeds"
@@ -17,9 +18,16 @@ RDF_ZIP_FILE_NAME = "rdf-files.tar.zip"
 RDF_ZIP_FILE_PATH = Config.DATA_FOLDER / RDF_ZIP_FILE_NAME
 RDF_UNZIP_FOLDER_NAME = "rdf_files"
 RDF_UNZIP_FOLDER_PATH = Config.DATA_FOLDER / RDF_UNZIP_FOLDER_NAME
+METADATA_CACHE_PATH = Config.DATA_FOLDER / "metadata.jsonl"
 
 BATCH_SIZE = 100
-MAX_WORKERS = 10
+MAX_WORKERS = 32
+# Batches waiting for the next stage, bounds memory when a later stage is slower.
+# The parse pool is also fed this many batches of files at a time.
+PARSE_QUEUE_SIZE = 4
+WRITE_QUEUE_SIZE = 4
+# Below this number of RDF files, parsing in a thread is cheaper than starting a process pool.
+PROCESS_POOL_MIN_FILES = 500
 
 logging.basicConfig(
     level=logging.INFO,
@@ -49,48 +57,74 @@ def prepare_rdf_data() -> None:
     else:
         logger.info("RDF folder already extracted. Skipping extraction.")
 
-def process_rdf_files(limit: int) -> list[Path]:
+    if METADATA_CACHE_PATH.exists() and METADATA_CACHE_PATH.stat().st_mtime < RDF_ZIP_FILE_PATH.stat().st_mtime:
+        logger.info("RDF archive is newer than the metadata cache. Discarding cache.")
+        METADATA_CACHE_PATH.unlink()
+
+def iter_rdf_paths(root: str) -> Iterator[str]:
+    """
+    Walk the one level of sub folders under root and yield the paths of the RDF files they contain.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            with os.scandir(entry.path) as sub_entries:
+                for sub_entry in sub_entries:
+                    if sub_entry.name.endswith(".rdf"):
+                        yield sub_entry.path
+
+def process_rdf_files(limit: int) -> list[str]:
     """
     Process RDF files and store book metadata into the database.
     :param limit: Maximum number of files to process.
     """
-    folder = RDF_UNZIP_FOLDER_PATH / "cache/epub"
-    count = 0
-
-    metadata_books_to_index = []
-    for sub_folder in folder.iterdir():
-        if not sub_folder.is_dir():
-            continue
-
-        for rdf_file in sub_folder.glob("*.rdf"):
-            logger.info(f"Found RDF file: {rdf_file}")
-            metadata_books_to_index.append(rdf_file)
-        count += 1
-        if count >= limit:
-            logger.info(f"Processing limit ({limit}) reached. Stopping.")
-            break
-
+    metadata_books_to_index = list(itertools.islice(iter_rdf_paths(str(RDF_UNZIP_FOLDER_PATH / "cache/epub")), limit))
+    logger.info(f"Found {len(metadata_books_to_index)} RDF files.")
     return metadata_books_to_index
 
+async def parse_batches(rdf_files: list[str], queue: asyncio.Queue) -> None:
+    """
+    Parse RDF files batch by batch off the event loop and hand the metadata over to the downloader.
+    """
+    max_workers = 1 if len(rdf_files) < PROCESS_POOL_MIN_FILES else None
+    metadata_iter = extract_all(rdf_files, max_workers=max_workers, cache_file=METADATA_CACHE_PATH,
+                                window=BATCH_SIZE * PARSE_QUEUE_SIZE)
+    while batch := await asyncio.to_thread(list, itertools.islice(metadata_iter, BATCH_SIZE)):
+        await queue.put(batch)
+    await queue.put(None)
+
+async def download_batches(parsed_queue: asyncio.Queue, write_queue: asyncio.Queue) -> int:
+    """
+    Download book contents batch by batch and hand them over to the database writer.
+    :return: Number of processed books.
+    """
+    processed = 0
+    # One session for the whole run, so connections stay open from one batch to the next.
+    async with create_http_session(MAX_WORKERS) as http_session:
+        while (batch := await parsed_queue.get()) is not None:
+            contents = await fetch_all(batch, concurrency=MAX_WORKERS, http_session=http_session)
+            await write_queue.put((batch, contents))
+            processed += len(batch)
+    await write_queue.put(None)
+    return processed
+
 async def main(limit: int) -> None:
     """
     Main entry point to prepare RDF data and process it.
     """
     prepare_rdf_data()
-    semaphore = asyncio.Semaphore(MAX_WORKERS)
     start_time = time.time()
-    async with aiohttp.ClientSession() as http_session:
-        with Session() as db_session:
-            books = process_rdf_files(limit)
-            tasks = [store_book_to_db(semaphore, http_session, db_session, book_metadata) for book_metadata in books]
-            results = await asyncio.gather(*tasks)
-
-    logger.info(f"Processed {len(results)} books in {time.time() - start_time:.2f} seconds.")
-    for idx, book in enumerate(results):
-        if book:
-            logger.info(f"Task {idx}: Book '{book.title}' stored successfully.")
-        else:
-            logger.warning(f"Task {idx}: Failed to store book.")
+    books = process_rdf_files(limit)
+    parsed_queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+    write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+    with Session() as db_session:
+        _, processed, created = await asyncio.gather(parse_batches(books, parsed_queue),
+                                                     download_batches(parsed_queue, write_queue),
+                                                     store_batches_to_db(db_session, write_queue))
+
+    logger.info(f"Processed {processed} books ({created} created) "
+                f"in {time.time() - start_time:.2f} seconds.")
 
 if __name__ == "__main__":
     app()
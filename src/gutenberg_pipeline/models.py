@@ -19,7 +19,7 @@ book_category_table = Table(
 class Category(Base):
     __tablename__ = 'categories'
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
 
     books = relationship("Book", secondary=book_category_table, back_populates="categories")
 
@@ -27,7 +27,8 @@ class Category(Base):
 class Author(Base):
     __tablename__ = 'authors'
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Not unique: authors are identified by their Gutenberg id, and distinct agents may share a name.
+    name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     birth_year: Mapped[int] = mapped_column(Integer, nullable=True)
     death_year: Mapped[int] = mapped_column(Integer, nullable=True)
 
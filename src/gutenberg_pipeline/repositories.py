@@ -1,38 +1,120 @@
+import csv
+import functools
+import io
 import logging
-from typing import Optional, Tuple
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import event, func, literal_column, or_, orm, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import column, table
 
-from gutenberg_pipeline.database import Session
-from gutenberg_pipeline.models import Author, Book, Category
+from gutenberg_pipeline.database import Session, write_lock
+from gutenberg_pipeline.models import Author, Book, Category, book_author_table, book_category_table
 
 logger = logging.getLogger(__name__)
 
+# Process-local name -> id caches, so popular authors and categories are only looked up once.
+_author_id_cache: dict[str, int] = {}
+_category_id_cache: dict[str, int] = {}
+
+
+def clear_id_caches() -> None:
+    """
+    Forget the cached author and category IDs.
+    """
+    _author_id_cache.clear()
+    _category_id_cache.clear()
+
+
+@event.listens_for(orm.Session, "after_rollback")
+def _clear_id_caches_on_rollback(session) -> None:
+    # IDs flushed in a rolled back transaction no longer exist.
+    clear_id_caches()
+
+
 def _handle_db_error(message: str) -> None:
     logger.error(message)
     raise ValueError(message)
 
 
+def _serialized(func):
+    """
+    Run a committing helper under the process-wide write lock.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with write_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# On PostgreSQL, xmax is only set on rows that already existed before the statement.
+_INSERTED = literal_column("(xmax = 0)").label("inserted")
+
+
+def _insert(db: Session, model):
+    """
+    Build an INSERT supporting ON CONFLICT clauses for the dialect of the session.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
 def create_author(db: Session, author_id: int, name: str,
                   birth_year: Optional[int], death_year: Optional[int]) -> Optional[Author]:
+    """
+    Add an author to the session. The caller is responsible for committing.
+    """
     try:
         author = Author(id=author_id, name=name, birth_year=birth_year, death_year=death_year)
         db.add(author)
-        db.commit()
-        db.refresh(author)
-        logger.info(f"Author {name} created successfully.")
+        db.flush()
+        logger.debug(f"Author {name} created successfully.")
         return author
     except SQLAlchemyError as e:
         db.rollback()
         _handle_db_error(f"Error creating author: {e}")
 
 
+def bulk_create_authors(db: Session, rows: list[dict]) -> list[int]:
+    """
+    Insert authors in a single statement, skipping the ones already stored.
+    The caller is responsible for committing.
+    :param db: Database session.
+    :param rows: Authors data with id, name, birth_year and death_year.
+    :return: IDs of the created authors.
+    """
+    if not rows:
+        return []
+    try:
+        stmt = (_insert(db, Author).values(rows)
+                .on_conflict_do_nothing(index_elements=["id"])
+                .returning(Author.id))
+        ids = db.execute(stmt).scalars().all()
+        logger.debug(f"{len(ids)} authors created successfully.")
+        return ids
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error creating authors: {e}")
+
+
 def get_author(db: Session, name: str) -> Optional[Author]:
-    return db.query(Author).filter(Author.name == name).first()
+    return db.scalars(select(Author).where(Author.name == name).limit(1)).first()
+
+
+def get_author_ids(db: Session) -> set[int]:
+    """
+    Load the IDs of all stored authors, to skip known authors without querying them one by one.
+    """
+    return set(db.execute(select(Author.id)).scalars())
 
 
 def get_or_create_authors(db: Session, authors_data: list[dict]) -> Optional[list[Author]]:
     """
-    Check if authors exist in the database, and create them if they don't.
+    Check if authors exist in the database with a single lookup, and create the missing ones.
+    The caller is responsible for committing.
     :param db: Database session.
     :param authors_data: List of authors data.
     :return: List of Author objects.
@@ -40,24 +122,41 @@ def get_or_create_authors(db: Session, authors_data: list[dict]) -> Optional[lis
     if not authors_data:
         return None
 
-    author_objects = []
-    for author_info in authors_data:
-        author = get_author(db, author_info["name"])
-        if not author:
-            author = create_author(db, author_info["id"], author_info["name"],
-                                   author_info.get("birth_year"), author_info.get("death_year"))
-        if author:
-            author_objects.append(author)
+    names = {author_info["name"] for author_info in authors_data}
+    # Cached authors are loaded by primary key, the other ones by name, all in the same query.
+    cached_ids = [_author_id_cache[name] for name in names if name in _author_id_cache]
+    try:
+        stmt = select(Author).where(or_(Author.id.in_(cached_ids),
+                                        Author.name.in_(names - _author_id_cache.keys())))
+        existing = {author.name: author for author in db.execute(stmt).scalars()}
+        new_authors = []
+        for author_info in authors_data:
+            if author_info["name"] not in existing:
+                author = Author(id=author_info["id"], name=author_info["name"],
+                                birth_year=author_info.get("birth_year"),
+                                death_year=author_info.get("death_year"))
+                existing[author.name] = author
+                new_authors.append(author)
+        if new_authors:
+            db.add_all(new_authors)
+            db.flush()
+            logger.debug(f"{len(new_authors)} authors created successfully.")
+        _author_id_cache.update((name, author.id) for name, author in existing.items())
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error creating authors: {e}")
 
-    return author_objects or None
+    return [existing[author_info["name"]] for author_info in authors_data] or None
 
 
+@_serialized
 def delete_author(db: Session, author_id: int) -> None:
     try:
-        author = db.query(Author).filter(Author.id == author_id).first()
+        author = db.get(Author, author_id)
         if author:
             db.delete(author)
             db.commit()
+            _author_id_cache.pop(author.name, None)
         logger.info(f"Author {id} deleted successfully.")
     except SQLAlchemyError as e:
         db.rollback()
@@ -65,12 +164,14 @@ def delete_author(db: Session, author_id: int) -> None:
 
 
 def create_category(db: Session, category_name: str) -> Optional[Category]:
+    """
+    Add a category to the session. The caller is responsible for committing.
+    """
     try:
         category = Category(name=category_name)
         db.add(category)
-        db.commit()
-        db.refresh(category)
-        logger.info(f"Category {category_name} created successfully.")
+        db.flush()
+        logger.debug(f"Category {category_name} created successfully.")
         return category
     except SQLAlchemyError as e:
         db.rollback()
@@ -78,30 +179,78 @@ def create_category(db: Session, category_name: str) -> Optional[Category]:
 
 
 def get_category(db: Session, name: str) -> Optional[Category]:
-    return db.query(Category).filter(Category.name == name).first()
+    return db.scalars(select(Category).where(Category.name == name).limit(1)).first()
 
 
 def get_or_create_categories(db: Session, categories_data: list[str]) -> Optional[list[Category]]:
     """
-    Check if categories exist in the database, and create them if they don't.
+    Check if categories exist in the database with a single lookup, and create the missing ones.
+    The caller is responsible for committing.
     :param db: Database session.
     :param categories_data: List of categories data.
-    :return: List of Author objects.
+    :return: List of Category objects.
     """
     if not categories_data:
         return None
 
-    category_objects = []
-    for category_name in categories_data:
-        category = get_category(db, category_name)
-        if not category:
-            category = create_category(db, category_name)
-        if category:
-            category_objects.append(category)
+    names = set(categories_data)
+    # Cached categories are loaded by primary key, the other ones by name, all in the same query.
+    cached_ids = [_category_id_cache[name] for name in names if name in _category_id_cache]
+    try:
+        stmt = select(Category).where(or_(Category.id.in_(cached_ids),
+                                          Category.name.in_(names - _category_id_cache.keys())))
+        existing = {category.name: category for category in db.execute(stmt).scalars()}
+        new_categories = []
+        for category_name in categories_data:
+            if category_name not in existing:
+                category = Category(name=category_name)
+                existing[category_name] = category
+                new_categories.append(category)
+        if new_categories:
+            db.add_all(new_categories)
+            db.flush()
+            logger.debug(f"{len(new_categories)} categories created successfully.")
+        _category_id_cache.update((name, category.id) for name, category in existing.items())
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error creating categories: {e}")
+
+    return [existing[category_name] for category_name in categories_data] or None
+
 
-    return category_objects or None
+def bulk_create_categories(db: Session, names: Iterable[str]) -> dict[str, int]:
+    """
+    Resolve category names to IDs with Core statements, inserting the missing categories.
+    The caller is responsible for committing.
+    :param db: Database session.
+    :param names: Category names.
+    :return: Category IDs by name.
+    """
+    names = set(names)
+    category_ids = {name: _category_id_cache[name] for name in names if name in _category_id_cache}
+    missing = names - category_ids.keys()
+    if not missing:
+        return category_ids
+    try:
+        # Existing names are looked up first: ON CONFLICT (name) would need a unique index on the name.
+        category_ids.update(db.execute(select(Category.name, Category.id)
+                                       .where(Category.name.in_(missing))).all())
+        created = {}
+        if len(category_ids) < len(names):
+            stmt = (_insert(db, Category).values([{"name": name} for name in names - category_ids.keys()])
+                    .returning(Category.name, Category.id))
+            created = dict(db.execute(stmt).all())
+            category_ids.update(created)
+        _category_id_cache.update(category_ids)
+        if created:
+            logger.debug(f"{len(created)} categories created successfully.")
+        return category_ids
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error creating categories: {e}")
 
 
+@_serialized
 def create_book(db: Session,
                 book_id: int,
                 title: str,
@@ -121,49 +270,157 @@ def create_book(db: Session,
             book.categories = categories
         db.add(book)
         db.commit()
-        db.refresh(book)
-        logger.info(f"Book {book_id} {title} created successfully.")
+        logger.debug(f"Book {book_id} {title} created successfully.")
         return book
     except SQLAlchemyError as e:
         db.rollback()
         _handle_db_error(f"Error creating book: {e}")
 
 
+def _on_conflict_update(stmt, columns: Iterable[str]):
+    """
+    Update the stored book on an ID conflict, None values keep the stored value.
+    """
+    return stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={name: func.coalesce(stmt.excluded[name], Book.__table__.c[name])
+              for name in columns if name != "id"})
+
+
+def upsert_books(db: Session, rows: list[dict],
+                 contents: Optional[list[Optional[str]]] = None) -> list[Tuple[int, bool]]:
+    """
+    Insert books or update the stored ones in a single statement. None values keep the stored value.
+    The caller is responsible for committing.
+    :param db: Database session.
+    :param rows: Books data keyed by Book column names, without content.
+    :param contents: Book contents in the order of rows.
+    :return: Pairs of book ID and whether the book was created.
+    """
+    if not rows:
+        return []
+    try:
+        if contents is not None:
+            rows = [{**row, "content": content} for row, content in zip(rows, contents)]
+        if db.get_bind().dialect.name == "postgresql":
+            if contents is not None:
+                result = copy_upsert_books(db, rows)
+            else:
+                stmt = _on_conflict_update(_insert(db, Book).values(rows), rows[0])
+                result = db.execute(stmt.returning(Book.id, _INSERTED)).all()
+        else:
+            ids = [row["id"] for row in rows]
+            existing = set(db.execute(select(Book.id).where(Book.id.in_(ids))).scalars())
+            stmt = _on_conflict_update(_insert(db, Book).values(rows), rows[0])
+            result = [(book_id, book_id not in existing) for book_id in db.execute(stmt.returning(Book.id)).scalars()]
+        logger.debug(f"{len(result)} books upserted successfully.")
+        return [(book_id, inserted) for book_id, inserted in result]
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error upserting books: {e}")
+
+
+def copy_upsert_books(db: Session, rows: list[dict]) -> list[Tuple[int, bool]]:
+    """
+    Load books, contents included, with PostgreSQL COPY instead of bound parameters.
+    Rows are copied into a temporary staging table and upserted from it with a single
+    INSERT ... SELECT, so each book is written once. The caller is responsible for committing.
+    :param db: Database session bound to PostgreSQL.
+    :param rows: Books data keyed by Book column names, all with the same keys.
+    :return: Pairs of book ID and whether the book was created.
+    """
+    columns = list(rows[0])
+    buf = io.StringIO()
+    csv.writer(buf).writerows([row[name] for name in columns] for row in rows)
+    buf.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS book_staging (LIKE books)")
+        cursor.execute("TRUNCATE book_staging")
+        cursor.copy_expert(f"COPY book_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        cursor.close()
+    staging = table("book_staging", *(column(name) for name in columns))
+    stmt = _on_conflict_update(postgresql.insert(Book).from_select(columns, select(*staging.c)), columns)
+    return db.execute(stmt.returning(Book.id, _INSERTED)).all()
+
+
+def bulk_link_authors(db: Session, pairs: list[dict]) -> None:
+    """
+    Link books to authors in a single executemany, skipping existing links.
+    The caller is responsible for committing.
+    :param db: Database session.
+    :param pairs: Links with book_id and author_id.
+    """
+    if pairs:
+        db.execute(_insert(db, book_author_table).on_conflict_do_nothing(), pairs)
+
+
+def bulk_link_categories(db: Session, pairs: list[dict]) -> None:
+    """
+    Link books to categories in a single executemany, skipping existing links.
+    The caller is responsible for committing.
+    :param db: Database session.
+    :param pairs: Links with book_id and category_id.
+    """
+    if pairs:
+        db.execute(_insert(db, book_category_table).on_conflict_do_nothing(), pairs)
+
+
+@_serialized
+def ingest_batch(db: Session, authors_rows: list[dict], books_rows: list[dict],
+                 contents: list[Optional[str]], book_author_rows: list[dict],
+                 book_category_rows: list[dict]) -> list[int]:
+    """
+    Store a batch of books with their authors and categories in a single transaction.
+    :param db: Database session.
+    :param authors_rows: Authors data with id, name, birth_year and death_year.
+    :param books_rows: Books data keyed by Book column names, without content.
+    :param contents: Book contents in the order of books_rows.
+    :param book_author_rows: Links between books and authors, with book_id and author_id.
+    :param book_category_rows: Links between books and categories, with book_id and category name.
+    :return: IDs of the created books.
+    """
+    try:
+        bulk_create_authors(db, authors_rows)
+        book_ids = [book_id for book_id, inserted in upsert_books(db, books_rows, contents) if inserted]
+        bulk_link_authors(db, book_author_rows)
+        category_ids = bulk_create_categories(db, {row["name"] for row in book_category_rows})
+        bulk_link_categories(db, [{"book_id": row["book_id"], "category_id": category_ids[row["name"]]}
+                                  for row in book_category_rows])
+        db.commit()
+        logger.info(f"Batch of {len(books_rows)} books stored, {len(book_ids)} created.")
+        return book_ids
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error storing batch of books: {e}")
+
+
+@_serialized
 def update_book(db: Session, book_id: int, **updates) -> Optional[Book]:
     """
     Update book information in the database.
     :param db: Database session.
     :param book_id: Book ID.
-    :param updates: Dictionary of fields to update.
-    :return: Updated Book object or NOne if book not found.
+    :param updates: Dictionary of fields to update, None values are skipped.
+    :return: Updated Book object or None if book not found.
     """
-    book = get_book_by_id(db, book_id)
-    if not book:
-        logger.warning(f"Book with ID {book_id} not found. Update skipped.")
-        return None
-
-    updated_fields = []
-    for field_name, new_value in updates.items():
-        if new_value is None or not hasattr(book, field_name):
-            continue
-        current_value = getattr(book, field_name)
-        if current_value != new_value and isinstance(new_value, type(current_value)):
-            setattr(book, field_name, new_value)
-            updated_fields.append(field_name)
-    if updated_fields:
-        try:
-            db.commit()
-            db.refresh(book)
-            logger.info(f"Book {book_id} updated successfully. Fields changed: {', '.join(updated_fields)}")
-        except SQLAlchemyError as e:
-            db.rollback()
-            _handle_db_error(f"Error updating book: {e}")
-    else:
-        logger.info(f"No fields updated for Book {book_id}.")
+    values = {field_name: new_value for field_name, new_value in updates.items()
+              if new_value is not None and field_name in Book.__table__.c and field_name != "id"}
+    try:
+        if values and not db.execute(update(Book).where(Book.id == book_id).values(values)).rowcount:
+            logger.warning(f"Book with ID {book_id} not found. Update skipped.")
+            return None
+        db.commit()
+        logger.debug(f"Book {book_id} updated successfully.")
+    except SQLAlchemyError as e:
+        db.rollback()
+        _handle_db_error(f"Error updating book: {e}")
 
-    return book
+    return get_book_by_id(db, book_id)
 
 
+@_serialized
 def update_or_create_book(db: Session, book_id: int, title: str,
                 authors_data: Optional[list[dict]],
                 categories_data: Optional[list[str]],
@@ -173,7 +430,7 @@ def update_or_create_book(db: Session, book_id: int, title: str,
                 content: Optional[str],
                 language: Optional[str]) -> Optional[Tuple[Book, bool]]:
     """
-    Check if the book exists in the database, and create it if it doesn't.
+    Create the book, or update it if it already exists.
     :param content:
     :param language:
     :param summary:
@@ -184,40 +441,37 @@ def update_or_create_book(db: Session, book_id: int, title: str,
     :param db: Database session.
     :param book_id: Book ID.
     :param title: Book title.
-    :return: Book object.
+    :return: Book object and whether it was created.
     """
     try:
         authors = get_or_create_authors(db, authors_data) if authors_data else None
         categories = get_or_create_categories(db, categories_data) if categories_data else None
 
-        book = get_book_by_id(db, book_id)
-        if book:
-            book = update_book(db, book_id=book_id, title=title,
-                           release_date=release_date, gutenberg_link=book_link,
-                           language=language, summary=summary,
-                           authors=authors, categories=categories, content=content)
-
-            return book, False
-        else:
-            book = create_book(db, book_id=book_id, title=title,
-                               release_date=release_date, gutenberg_link=book_link,
-                               language=language, summary=summary,
-                               authors=authors, categories=categories, content=content)
-
-            return book, True
+        (book_id, created), = upsert_books(db, [{"id": book_id, "title": title, "release_date": release_date,
+                                                 "gutenberg_link": book_link, "summary": summary,
+                                                 "content": content, "language": language}])
+        if authors:
+            bulk_link_authors(db, [{"book_id": book_id, "author_id": author.id} for author in authors])
+        if categories:
+            bulk_link_categories(db, [{"book_id": book_id, "category_id": category.id} for category in categories])
+        db.commit()
+        book = db.get(Book, book_id, options=[selectinload(Book.authors), selectinload(Book.categories)])
+        logger.debug(f"Book {book_id} {title} {'created' if created else 'updated'} successfully.")
+        return book, created
     except SQLAlchemyError as e:
         db.rollback()
         _handle_db_error(f"Error updating or creating book: {e}")
 
 
 def get_book_by_title(db: Session, title: str) -> Optional[Book]:
-    return db.query(Book).filter(Book.title == title).first()
+    return db.scalars(select(Book).where(Book.title == title).limit(1)).first()
 
 
 def get_book_by_id(db: Session, book_id: int) -> Optional[Book]:
-    return db.query(Book).filter(Book.id == book_id).first()
+    return db.get(Book, book_id)
 
 
+@_serialized
 def delete_book(db: Session, book_id: int) -> None:
     try:
         book = get_book_by_id(db, book_id=book_id)
@@ -1,52 +1,191 @@
+import asyncio
+import itertools
 import logging
-from asyncio import Semaphore
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
-from aiohttp import ClientSession
+import orjson
 
-from gutenberg_pipeline import Book
 from gutenberg_pipeline.database import Session
-from gutenberg_pipeline.repositories import update_or_create_book
-from gutenberg_pipeline.extract.content_cleaner import parse_book
-from gutenberg_pipeline.extract.rdf_parser import parse_xml_file, extract_metadata
+from gutenberg_pipeline.repositories import get_author_ids, ingest_batch
+from gutenberg_pipeline.extract.rdf_parser import parse_rdf
 
 logger = logging.getLogger(__name__)
 
-def fetch_metadata_from_rdf_file(rdf_file_path: Path) -> Optional[dict]:
+# Number of RDF files between two progress lines at INFO level.
+PROGRESS_LOG_INTERVAL = 1000
+# The pool is started while other threads run, forking the whole process then could deadlock its workers.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+def load_metadata_cache(cache_file: Path) -> dict[str, dict]:
+    """
+    Read the metadata written by previous runs.
+    :param cache_file: JSON lines file with one {"rdf_file", "metadata"} object per line.
+    :return: Metadata keyed by RDF file path.
+    """
+    if not cache_file.exists():
+        return {}
+    cache = {}
+    with open(cache_file, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # A killed run can leave a truncated last line, that file gets parsed again.
+                logger.warning(f"Skipping invalid line {line_number} of the metadata cache {cache_file}.")
+                continue
+            cache[entry["rdf_file"]] = entry["metadata"]
+    return cache
+
+
+def _open_cache_for_append(cache_file: Path):
+    """
+    Open the metadata cache for appending, starting on a new line if the last one was left incomplete.
+    """
+    out = open(cache_file, "a+b")
+    if out.seek(0, os.SEEK_END):
+        out.seek(-1, os.SEEK_END)
+        if out.read(1) != b"\n":
+            out.write(b"\n")
+    return out
+
+
+def _parse_rdf_json(rdf_file: str) -> Optional[bytes]:
     """
-    Parse RDF file and extract metadata.
+    Parse an RDF file and return its metadata encoded as JSON, which crosses the process pool
+    boundary faster than a pickled dict and is written to the metadata cache as is.
     """
-    tree = parse_xml_file(rdf_file_path)
-    if tree is None:
-        raise ValueError(f"Failed to parse XML file: {rdf_file_path}")
-    metadata = extract_metadata(tree)
-    if metadata is None:
-        raise ValueError(f"Failed to extract metadata from XML file: {rdf_file_path}")
+    metadata = parse_rdf(rdf_file)
+    return orjson.dumps(metadata) if metadata is not None else None
 
-    return metadata
 
+def _parse_in_windows(executor: ProcessPoolExecutor, rdf_files: list[str], window: int,
+                      workers: int) -> Iterable[Optional[bytes]]:
+    """
+    Parse files in the pool a window at a time. Only the window being consumed and the next one are
+    submitted, so workers do not run ahead of the consumer and pile up results for the whole file list.
+    """
+    chunksize = max(1, window // (4 * workers))
+    windows = (rdf_files[i:i + window] for i in range(0, len(rdf_files), window))
+    pending = deque(executor.map(_parse_rdf_json, files, chunksize=chunksize)
+                    for files in itertools.islice(windows, 1))
+    while pending:
+        results = pending.popleft()
+        if (files := next(windows, None)) is not None:
+            pending.append(executor.map(_parse_rdf_json, files, chunksize=chunksize))
+        yield from results
 
-async def store_book_to_db(semaphore: Semaphore, http_session: ClientSession,
-                           db_session: Session, file_path: Path) -> Optional[Book]:
+
+def extract_all(rdf_files: list[str], max_workers: Optional[int] = None,
+                cache_file: Optional[Path] = None, window: int = 512) -> Iterator[dict]:
+    """
+    Parse RDF files in a process pool and yield their metadata in file order.
+    With a cache file, files parsed by previous runs are read from it instead of being
+    parsed again, and newly parsed files are appended to it.
+    :param rdf_files: RDF files to parse.
+    :param max_workers: Number of worker processes, defaults to the number of CPUs.
+        With 1, files are parsed in the calling thread without starting a process pool.
+    :param cache_file: Metadata cache to read from and append to.
+    :param window: Number of files submitted to the pool at a time.
+    :return: Iterator over the metadata of the files that could be parsed.
     """
-    Store book in the database.
-    :param semaphore:
-    :param http_session:
+    cache = load_metadata_cache(cache_file) if cache_file else {}
+    misses = [rdf_file for rdf_file in rdf_files if str(rdf_file) not in cache]
+    if cache:
+        logger.info(f"{len(rdf_files) - len(misses)} RDF files read from the metadata cache.")
+
+    workers = max_workers or os.cpu_count()
+    with (ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) if workers != 1 else nullcontext()
+          as executor, _open_cache_for_append(cache_file) if cache_file else nullcontext() as out):
+        parsed = iter(_parse_in_windows(executor, misses, window, workers) if executor
+                      else map(_parse_rdf_json, misses))
+        for index, rdf_file in enumerate(rdf_files, 1):
+            if index % PROGRESS_LOG_INTERVAL == 0:
+                logger.info(f"Read {index}/{len(rdf_files)} RDF files.")
+            metadata = cache.get(str(rdf_file))
+            if metadata is None:
+                encoded = next(parsed)
+                if encoded is None:
+                    logger.warning(f"Failed to parse RDF file: {rdf_file}")
+                    continue
+                metadata = orjson.loads(encoded)
+                if out is not None:
+                    out.write(b'{"rdf_file":' + orjson.dumps(str(rdf_file)) + b',"metadata":' + encoded + b'}\n')
+            yield metadata
+
+
+def store_books_to_db(db_session: Session, metadata_list: list[dict], contents: list[Optional[str]],
+                      known_author_ids: Optional[set[int]] = None) -> list[int]:
+    """
+    Store a batch of books, with their authors and categories, in the database.
     :param db_session:
-    :param file_path:
-    """
-    metadata = fetch_metadata_from_rdf_file(file_path)
-    if not metadata:
-        logger.warning("No metadata found.")
-        return None
-
-    book_text = await parse_book(semaphore, http_session, metadata)
-    book, created = update_or_create_book(db_session, book_id=metadata["gutenberg_id"], title=metadata["title"],
-                              release_date=metadata.get("release_date"), book_link=metadata.get("book_link"),
-                              language=metadata.get("language"), summary=metadata.get("summary"),
-                              authors_data=metadata.get("authors"), categories_data=metadata.get("categories"),
-                              content=book_text)
-    logger.info(f"Book '{book.title}' {'created' if created else 'updated'} successfully.")
-
-    return book
+    :param metadata_list: Books metadata extracted from their RDF files.
+    :param contents: Downloaded book contents, in the order of metadata_list.
+    :param known_author_ids: IDs of the authors already stored, updated with the new ones.
+    :return: IDs of the created books.
+    """
+    if known_author_ids is None:
+        known_author_ids = set()
+    books_rows, book_contents = [], []
+    authors_rows = {}
+    book_author_rows, book_category_rows = [], []
+    for metadata, book_text in zip(metadata_list, contents):
+        book_id = metadata["gutenberg_id"]
+        if book_id is None or not metadata.get("title") or not metadata.get("release_date"):
+            logger.warning(f"Skipping book {book_id}: missing ID, title or release date.")
+            continue
+
+        books_rows.append({
+            "id": book_id,
+            "title": metadata["title"],
+            "release_date": metadata["release_date"],
+            "gutenberg_link": metadata.get("book_link"),
+            "summary": metadata.get("summary"),
+            "language": metadata.get("language"),
+        })
+        book_contents.append(book_text)
+        for author in metadata.get("authors") or []:
+            if author["id"] is None:
+                continue
+            author_id = int(author["id"])
+            if author_id not in known_author_ids:
+                authors_rows.setdefault(author_id, {**author, "id": author_id})
+            book_author_rows.append({"book_id": book_id, "author_id": author_id})
+        for category in metadata.get("categories") or []:
+            book_category_rows.append({"book_id": book_id, "name": category})
+
+    created_book_ids = ingest_batch(db_session, list(authors_rows.values()), books_rows, book_contents,
+                                    book_author_rows, book_category_rows)
+    known_author_ids.update(authors_rows)
+    return created_book_ids
+
+
+def _load_known_author_ids(db_session: Session) -> set[int]:
+    author_ids = get_author_ids(db_session)
+    # End the read transaction, the connection would otherwise stay idle in transaction until the first batch.
+    db_session.commit()
+    return author_ids
+
+
+async def store_batches_to_db(db_session: Session, queue: asyncio.Queue) -> int:
+    """
+    Store the (metadata_list, contents) batches put on the queue until None is received.
+    Each batch is written in its own transaction in a worker thread, so downloads keep running
+    on the event loop.
+    :param db_session:
+    :param queue: Queue of downloaded batches.
+    :return: Number of created books.
+    """
+    created = 0
+    known_author_ids = await asyncio.to_thread(_load_known_author_ids, db_session)
+    while (item := await queue.get()) is not None:
+        metadata_list, contents = item
+        created += len(await asyncio.to_thread(store_books_to_db, db_session, metadata_list, contents,
+                                               known_author_ids))
+    return created
@@ -1,10 +1,16 @@
+from datetime import date
+
 import pytest
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from gutenberg_pipeline.database import Base
-from gutenberg_pipeline.repositories import create_author, get_author
+from gutenberg_pipeline.models import Book
+from gutenberg_pipeline.repositories import (bulk_create_authors, bulk_create_categories, clear_id_caches,
+                                             create_author, create_category, get_author, get_or_create_categories,
+                                             get_or_create_authors, ingest_batch, update_or_create_book,
+                                             upsert_books)
 
 
 @pytest.fixture
@@ -14,6 +20,7 @@ def session():
     connection = engine.connect()
     transaction = connection.begin()
     db = scoped_session(sessionmaker(bind=engine))
+    clear_id_caches()
     yield db
     transaction.rollback()
     connection.close()
@@ -32,3 +39,108 @@ def test_get_author(session):
 
     assert author is not None
     assert author.name == "toto"
+
+
+def test_bulk_create_authors_skips_existing(session):
+    rows = [{"id": 1, "name": "toto"}, {"id": 2, "name": "tata"}]
+    assert sorted(bulk_create_authors(session, rows)) == [1, 2]
+
+    rows.append({"id": 3, "name": "titi"})
+    assert bulk_create_authors(session, rows) == [3]
+    assert get_author(session, "titi") is not None
+
+
+def test_create_category_flushes_id(session):
+    category = create_category(session, "Horror")
+
+    assert category.id is not None
+    assert get_or_create_categories(session, ["Horror"]) == [category]
+
+
+def test_get_or_create_categories(session):
+    first = get_or_create_categories(session, ["Gothic Fiction", "Horror"])
+    second = get_or_create_categories(session, ["Horror", "Gothic Fiction", "Science Fiction"])
+
+    assert [category.name for category in second] == ["Horror", "Gothic Fiction", "Science Fiction"]
+    assert second[0] is first[1]
+    assert second[2].id is not None
+
+
+def test_bulk_create_categories(session):
+    horror, = get_or_create_categories(session, ["Horror"])
+    clear_id_caches()
+
+    category_ids = bulk_create_categories(session, ["Horror", "Gothic Fiction"])
+    assert category_ids["Horror"] == horror.id
+    assert bulk_create_categories(session, ["Gothic Fiction"]) == {"Gothic Fiction": category_ids["Gothic Fiction"]}
+
+
+def test_category_id_cache(session):
+    from gutenberg_pipeline import repositories
+
+    category, = get_or_create_categories(session, ["Horror"])
+    assert repositories._category_id_cache == {"Horror": category.id}
+
+    session.rollback()
+    assert repositories._category_id_cache == {}
+
+
+def test_get_or_create_authors_cache_hit_uses_one_query(session):
+    authors_data = [{"id": author_id, "name": f"Author {author_id}"} for author_id in range(1, 6)]
+    get_or_create_authors(session, authors_data)
+    session.commit()
+
+    statements = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    authors = get_or_create_authors(session, authors_data)
+
+    assert [author.id for author in authors] == [1, 2, 3, 4, 5]
+    assert len(statements) == 1
+
+
+def test_ingest_batch(session):
+    books_rows = [
+        {"id": 84, "title": "Frankenstein", "release_date": date(1993, 10, 1)},
+        {"id": 85, "title": "Another book", "release_date": date(2001, 1, 1)},
+    ]
+    contents = ["It was on a dreary night of November.", None]
+    book_author_rows = [{"book_id": 84, "author_id": 61}]
+    book_category_rows = [{"book_id": 84, "name": "Gothic Fiction"}, {"book_id": 85, "name": "Gothic Fiction"}]
+
+    created = ingest_batch(session, [{"id": 61, "name": "Shelley, Mary"}], books_rows, contents,
+                           book_author_rows, book_category_rows)
+
+    assert sorted(created) == [84, 85]
+    book = session.get(Book, 84)
+    assert [author.name for author in book.authors] == ["Shelley, Mary"]
+    assert [category.name for category in book.categories] == ["Gothic Fiction"]
+    assert book.content == "It was on a dreary night of November."
+    assert session.get(Book, 85).categories[0].id == book.categories[0].id
+    assert ingest_batch(session, [], books_rows, contents, [], []) == []
+
+
+def test_upsert_books(session):
+    rows = [{"id": 84, "title": "Frankenstein", "release_date": date(1993, 10, 1), "summary": "A monster."}]
+    assert upsert_books(session, rows) == [(84, True)]
+
+    rows = [{"id": 84, "title": "Frankenstein; Or, The Modern Prometheus", "release_date": date(1993, 10, 1),
+             "summary": None},
+            {"id": 85, "title": "Another book", "release_date": date(2001, 1, 1), "summary": None}]
+    assert upsert_books(session, rows) == [(84, False), (85, True)]
+    book = session.get(Book, 84, populate_existing=True)
+    assert book.title == "Frankenstein; Or, The Modern Prometheus"
+    assert book.summary == "A monster."
+
+
+def test_update_or_create_book(session):
+    book, created = update_or_create_book(session, 84, "Frankenstein", [{"id": 61, "name": "Shelley, Mary"}],
+                                          ["Gothic Fiction"], date(1993, 10, 1), None, None, None, "en")
+    assert created
+    assert [author.name for author in book.authors] == ["Shelley, Mary"]
+
+    book, created = update_or_create_book(session, 84, "Frankenstein", None, None, date(1993, 10, 1),
+                                          None, "A monster.", None, None)
+    assert not created
+    assert book.summary == "A monster."
+    assert book.language == "en"
+    assert [category.name for category in book.categories] == ["Gothic Fiction"]
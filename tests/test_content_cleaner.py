@@ -0,0 +1,48 @@
+from gutenberg_pipeline.extract.content_cleaner import extract_book_content, extract_book_content_from_bytes
+
+
+def test_extract_book_content():
+    text = ("Header\n*** START OF THE PROJECT GUTENBERG EBOOK FRANKENSTEIN ***\n"
+            "Chapter 1\n*** END OF THE PROJECT GUTENBERG EBOOK FRANKENSTEIN ***\nLicense")
+
+    assert extract_book_content("Frankenstein", text) == "Chapter 1"
+
+
+def test_extract_book_content_keeps_offsets_with_expanding_characters():
+    text = ("Straße\n*** start of the project gutenberg ebook faust ***\n"
+            "Inhalt\n*** end of the project gutenberg ebook faust ***\n")
+
+    assert extract_book_content("Faust", text) == "Inhalt"
+
+
+def test_extract_book_content_without_markers():
+    text = "Just some text (with [regex] characters?)"
+
+    assert extract_book_content("What?", text) == text
+
+
+def test_extract_book_content_from_bytes():
+    body = ("Préface\n*** START OF THE PROJECT GUTENBERG EBOOK LES MISÉRABLES ***\n"
+            "Tome I\n*** END OF THE PROJECT GUTENBERG EBOOK LES MISÉRABLES ***\n").encode("utf-8")
+
+    assert extract_book_content_from_bytes("Les Misérables", body) == "Tome I"
+
+
+def test_extract_book_content_from_bytes_with_non_ascii_case_mismatch():
+    body = ("Préface\n*** Start of the Project Gutenberg EBook Les Misérables ***\n"
+            "Tome I\n*** End of the Project Gutenberg EBook Les Misérables ***\n").encode("utf-8")
+
+    assert extract_book_content_from_bytes("Les Misérables", body) == "Tome I"
+    assert extract_book_content_from_bytes("LES MISÉRABLES", body) == "Tome I"
+
+
+class _NoUpperBytes(bytes):
+    def upper(self):
+        raise AssertionError("body was upper-cased")
+
+
+def test_extract_book_content_from_bytes_finds_upper_case_markers_without_copy():
+    body = _NoUpperBytes(("Préface\n*** START OF THE PROJECT GUTENBERG EBOOK LES MISÉRABLES ***\n"
+                          "Tome I\n*** END OF THE PROJECT GUTENBERG EBOOK LES MISÉRABLES ***\n").encode("utf-8"))
+
+    assert extract_book_content_from_bytes("Les Misérables", body) == "Tome I"
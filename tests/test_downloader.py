@@ -0,0 +1,156 @@
+import json
+import re
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from gutenberg_pipeline.extract import downloader
+from gutenberg_pipeline.extract.downloader import DOWNLOAD_SLICES, download_rdf_file
+
+DATA = bytes(range(256)) * 64
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    accept_ranges = True
+    send_length = True
+    # Range requests starting at these offsets get the whole file with a 200.
+    ignored_offsets = set()
+    ranges = []
+    # When set, the range starting at 0 stops after stall_after bytes until the event is set.
+    stall = None
+    stall_after = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        if self.send_length:
+            self.send_header("Content-Length", str(len(DATA)))
+        if self.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        self.ranges.append(self.headers.get("Range"))
+        if match and self.accept_ranges and int(match[1]) not in self.ignored_offsets:
+            end = int(match[2]) if match[2] else len(DATA) - 1
+            body = DATA[int(match[1]):end + 1]
+            self.send_response(206)
+        else:
+            body = DATA
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.stall is not None and match and int(match[1]) == 0:
+            self.wfile.write(body[:self.stall_after])
+            self.wfile.flush()
+            self.stall.wait(10)
+            body = body[self.stall_after:]
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    RangeHandler.accept_ranges = True
+    RangeHandler.send_length = True
+    RangeHandler.ignored_offsets = set()
+    RangeHandler.ranges = []
+    RangeHandler.stall = None
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/rdf-files.tar.zip"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_rdf_file_in_slices(server, tmp_path):
+    target = tmp_path / "rdf-files.tar.zip"
+    download_rdf_file(server, target)
+
+    assert target.read_bytes() == DATA
+    assert len(RangeHandler.ranges) == DOWNLOAD_SLICES
+    assert not (tmp_path / "rdf-files.tar.zip.part").exists()
+    assert not (tmp_path / "rdf-files.tar.zip.progress").exists()
+
+
+def test_download_rdf_file_range_ignored(server, tmp_path):
+    RangeHandler.ignored_offsets = {4096}
+    target = tmp_path / "rdf-files.tar.zip"
+    download_rdf_file(server, target)
+
+    assert target.read_bytes() == DATA
+
+
+def test_download_rdf_file_without_range_support(server, tmp_path):
+    RangeHandler.accept_ranges = False
+    target = tmp_path / "rdf-files.tar.zip"
+    download_rdf_file(server, target)
+
+    assert target.read_bytes() == DATA
+    assert len(RangeHandler.ranges) == 1
+
+
+def test_download_rdf_file_resumes(server, tmp_path):
+    target = tmp_path / "rdf-files.tar.zip"
+    slice_size = len(DATA) // DOWNLOAD_SLICES
+    part = bytearray(len(DATA))
+    part[:1000] = DATA[:1000]
+    (tmp_path / "rdf-files.tar.zip.part").write_bytes(part)
+    (tmp_path / "rdf-files.tar.zip.progress").write_text(json.dumps([1000] + [0] * (DOWNLOAD_SLICES - 1)))
+
+    download_rdf_file(server, target)
+
+    assert target.read_bytes() == DATA
+    assert f"bytes=1000-{slice_size - 1}" in RangeHandler.ranges
+
+
+def test_download_rdf_file_saves_progress_mid_slice(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "DOWNLOAD_CHUNK_SIZE", 256)
+    monkeypatch.setattr(downloader, "PROGRESS_SAVE_INTERVAL", 512)
+    RangeHandler.stall = threading.Event()
+    RangeHandler.stall_after = 1024
+    target = tmp_path / "rdf-files.tar.zip"
+    progress_file = tmp_path / "rdf-files.tar.zip.progress"
+    thread = threading.Thread(target=download_rdf_file, args=(server, target))
+    thread.start()
+
+    # Snapshot the files while slice 0 is stalled, as a killed process would leave them.
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            if json.loads(progress_file.read_text())[0] >= 512:
+                break
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.01)
+    killed = tmp_path / "killed"
+    killed.mkdir()
+    shutil.copy(progress_file, killed / progress_file.name)
+    shutil.copy(tmp_path / "rdf-files.tar.zip.part", killed / "rdf-files.tar.zip.part")
+    RangeHandler.stall.set()
+    thread.join()
+    assert target.read_bytes() == DATA
+
+    saved = json.loads((killed / progress_file.name).read_text())[0]
+    assert 512 <= saved <= 1024
+    RangeHandler.stall = None
+    RangeHandler.ranges = []
+    download_rdf_file(server, killed / "rdf-files.tar.zip")
+
+    assert (killed / "rdf-files.tar.zip").read_bytes() == DATA
+    assert any(requested.startswith(f"bytes={saved}-") for requested in RangeHandler.ranges)
+
+
+def test_download_rdf_file_without_size(server, tmp_path):
+    RangeHandler.send_length = False
+    target = tmp_path / "rdf-files.tar.zip"
+
+    with pytest.raises(ValueError):
+        download_rdf_file(server, target)
+    assert not target.exists()
@@ -0,0 +1,117 @@
+import pytest
+
+from gutenberg_pipeline.extract.rdf_parser import parse_rdf
+
+RDF_CONTENT = """<?xml version="1.0" encoding="utf-8"?>
+<rdf:RDF xml:base="http://www.gutenberg.org/"
+  xmlns:dcam="http://purl.org/dc/dcam/"
+  xmlns:dcterms="http://purl.org/dc/terms/"
+  xmlns:pgterms="http://www.gutenberg.org/2009/pgterms/"
+  xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <pgterms:ebook rdf:about="ebooks/84">
+    <dcterms:creator>
+      <pgterms:agent rdf:about="2009/agents/61">
+        <pgterms:birthdate>1797</pgterms:birthdate>
+        <pgterms:name>Shelley, Mary Wollstonecraft</pgterms:name>
+        <pgterms:deathdate>1851</pgterms:deathdate>
+      </pgterms:agent>
+    </dcterms:creator>
+    <pgterms:marc520>A gothic novel.</pgterms:marc520>
+    <dcterms:issued>1993-10-01</dcterms:issued>
+    <dcterms:title>Frankenstein</dcterms:title>
+    <dcterms:language>
+      <rdf:Description><rdf:value>en</rdf:value></rdf:Description>
+    </dcterms:language>
+    <dcterms:hasFormat>
+      <pgterms:file rdf:about="https://www.gutenberg.org/ebooks/84.epub3.images">
+        <dcterms:format>
+          <rdf:Description><rdf:value>application/epub+zip</rdf:value></rdf:Description>
+        </dcterms:format>
+      </pgterms:file>
+    </dcterms:hasFormat>
+    <dcterms:hasFormat>
+      <pgterms:file rdf:about="https://www.gutenberg.org/ebooks/84.txt.utf-8">
+        <dcterms:format>
+          <rdf:Description><rdf:value>text/plain; charset=utf-8</rdf:value></rdf:Description>
+        </dcterms:format>
+      </pgterms:file>
+    </dcterms:hasFormat>
+    <dcterms:hasFormat>
+      <pgterms:file rdf:about="https://www.gutenberg.org/cache/epub/84/pg84.txt">
+        <dcterms:format>
+          <rdf:Description><rdf:value>text/plain</rdf:value></rdf:Description>
+        </dcterms:format>
+      </pgterms:file>
+    </dcterms:hasFormat>
+    <pgterms:bookshelf>
+      <rdf:Description><rdf:value>Gothic Fiction</rdf:value></rdf:Description>
+    </pgterms:bookshelf>
+    <pgterms:bookshelf>
+      <rdf:Description><rdf:value>Browsing: Fiction</rdf:value></rdf:Description>
+    </pgterms:bookshelf>
+  </pgterms:ebook>
+</rdf:RDF>
+"""
+
+
+@pytest.fixture
+def rdf_file(tmp_path):
+    path = tmp_path / "pg84.rdf"
+    path.write_text(RDF_CONTENT, encoding="utf-8")
+    return path
+
+
+def test_parse_rdf(rdf_file):
+    metadata = parse_rdf(rdf_file)
+
+    assert metadata == {
+        "gutenberg_id": 84,
+        "categories": ["Gothic Fiction"],
+        "release_date": "1993-10-01",
+        "book_link": "https://www.gutenberg.org/ebooks/84.txt.utf-8",
+        "authors": [
+            {"id": "61", "name": "Shelley, Mary Wollstonecraft", "birth_year": 1797, "death_year": 1851}
+        ],
+        "title": "Frankenstein",
+        "summary": "A gothic novel.",
+        "language": "en"
+    }
+
+
+def test_parse_rdf_invalid_file(tmp_path):
+    path = tmp_path / "broken.rdf"
+    path.write_text("<broken", encoding="utf-8")
+
+    assert parse_rdf(path) is None
+
+
+def test_parse_rdf_reuses_parser_after_invalid_file(rdf_file, tmp_path):
+    path = tmp_path / "broken.rdf"
+    path.write_text("<broken", encoding="utf-8")
+    expected = parse_rdf(rdf_file)
+
+    assert parse_rdf(path) is None
+    assert parse_rdf(rdf_file) == expected
+
+
+def test_parse_rdf_missing_fields(tmp_path):
+    path = tmp_path / "pg5.rdf"
+    path.write_text(
+        '<rdf:RDF xmlns:dcterms="http://purl.org/dc/terms/"'
+        ' xmlns:pgterms="http://www.gutenberg.org/2009/pgterms/"'
+        ' xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+        '<pgterms:ebook rdf:about="ebooks/5"><dcterms:title>Only A Title</dcterms:title></pgterms:ebook>'
+        '</rdf:RDF>',
+        encoding="utf-8"
+    )
+
+    assert parse_rdf(path) == {
+        "gutenberg_id": 5,
+        "categories": None,
+        "release_date": None,
+        "book_link": None,
+        "authors": None,
+        "title": "Only A Title",
+        "summary": None,
+        "language": None
+    }
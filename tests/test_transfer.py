@@ -0,0 +1,45 @@
+from gutenberg_pipeline.transfer import extract_all, load_metadata_cache
+from tests.test_rdf_parser import RDF_CONTENT
+
+
+def test_extract_all_in_thread_with_cache(tmp_path):
+    rdf_file = tmp_path / "pg84.rdf"
+    rdf_file.write_text(RDF_CONTENT, encoding="utf-8")
+    bad_file = tmp_path / "bad.rdf"
+    bad_file.write_text("<rdf:RDF", encoding="utf-8")
+    cache_file = tmp_path / "metadata.jsonl"
+
+    metadata, = extract_all([str(rdf_file), str(bad_file)], max_workers=1, cache_file=cache_file)
+
+    assert metadata["gutenberg_id"] == 84
+    assert load_metadata_cache(cache_file) == {str(rdf_file): metadata}
+    assert list(extract_all([str(rdf_file)], max_workers=1, cache_file=cache_file)) == [metadata]
+
+
+def test_extract_all_in_pool_windows(tmp_path):
+    rdf_files = []
+    for book_id in range(1, 6):
+        rdf_file = tmp_path / f"pg{book_id}.rdf"
+        rdf_file.write_text(RDF_CONTENT.replace("ebooks/84", f"ebooks/{book_id}"), encoding="utf-8")
+        rdf_files.append(str(rdf_file))
+
+    metadata_list = list(extract_all(rdf_files, max_workers=2, window=2))
+
+    assert [metadata["gutenberg_id"] for metadata in metadata_list] == [1, 2, 3, 4, 5]
+
+
+def test_extract_all_after_truncated_cache_line(tmp_path):
+    rdf_file = tmp_path / "pg84.rdf"
+    rdf_file.write_text(RDF_CONTENT, encoding="utf-8")
+    cache_file = tmp_path / "metadata.jsonl"
+    metadata, = extract_all([str(rdf_file)], max_workers=1, cache_file=cache_file)
+    # A run killed while appending an entry.
+    with open(cache_file, "ab") as f:
+        f.write(b'{"rdf_file": "pg85.rdf", "meta')
+
+    assert list(extract_all([str(rdf_file)], max_workers=1, cache_file=cache_file)) == [metadata]
+    other_file = tmp_path / "pg85.rdf"
+    other_file.write_text(RDF_CONTENT.replace("ebooks/84", "ebooks/85"), encoding="utf-8")
+    other, = extract_all([str(other_file)], max_workers=1, cache_file=cache_file)
+
+    assert load_metadata_cache(cache_file) == {str(rdf_file): metadata, str(other_file): other}